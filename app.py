@@ -136,7 +136,7 @@ from inventory_app import (
     get_batches, mark_as_shipped, delete_batch, get_recipe, add_recipe,
     change_recipe, delete_recipe, delete_raw_material, get_material_by_id, get_all_materials_with_id, update_raw_material, get_all_batches_with_id, get_batch_by_id,
     update_batch, update_batch_status, update_recipe, get_all_recipes_with_id, get_recipe_by_id, log_action, view_logs, get_batch_materials,
-    get_batches_planned, get_housemade_materials, get_mix_stock, adjust_batch_material, check_batch_materials_stock)
+    get_batches_planned, get_ready_and_planned_batches, get_housemade_materials, get_mix_stock, adjust_batch_material, check_batch_materials_stock)
 
 
 # Import helper functions for exporting data
@@ -855,12 +855,11 @@ def view_batches():
     
     """
 
-    data = get_batches()
+    data, planned_data = get_ready_and_planned_batches() # one query for both lists
     all_ready = data.to_dict(orient='records') if not data.empty else []
     ready_standard = [b for b in all_ready if b.get('batch_type') != 'mix']
     ready_mix       = [b for b in all_ready if b.get('batch_type') == 'mix']
 
-    planned_data = get_batches_planned()
     all_planned = planned_data.to_dict(orient='records') if not planned_data.empty else []
     planned_standard = [b for b in all_planned if b.get('batch_type') != 'mix']
     planned_mix      = [b for b in all_planned if b.get('batch_type') == 'mix']
@@ -1719,10 +1718,9 @@ def delete_recipe_route(recipe_id):
 @app.route('/api/health')
 def health_check():
     try:
-        db = get_db_connection() # check if connection string is working
-        cursor = db.cursor() # make sure we can get a cursor
-        db.execute(cursor, "SELECT 1") # simple query  to check if we can execute queries
-        db.close() # close connection after check
+        with get_db_connection() as db: # check if connection string is working (handed back even if the query fails)
+            cursor = db.cursor() # make sure we can get a cursor
+            db.execute(cursor, "SELECT 1") # simple query  to check if we can execute queries
         db_status = 'connected' # status is connected if all above steps work. 
     except Exception as e:
         logging.error(f"health_check: {e}", exc_info=True)
@@ -5,8 +5,11 @@ Main entry point for user interaction
 
 import sys
 import os
+import logging
 from datetime import datetime
 
+from database import prewarm_connection
+
 # Import all functions from your existing inventory_app.py
 from inventory_app import (
     create_database,
@@ -271,14 +274,14 @@ def restock_material():
         return#needs material info to have worked
     
     # Show current stock before asking for increase
-    _, name, current_stock, reorder_level, cost = material_info
+    material_id, name, current_stock, reorder_level, cost = material_info
     print(f"\n📊 Current stock: {current_stock} units") #print current inventory of mat
     print(f"   Reorder level: {reorder_level} units\n")
     
     amount_to_add = get_float_input("Enter amount to add: ", min_val=0, allow_zero=False)# get valid float input
     
     # Call inventory_app function
-    new_stock = increase_raw_material(material_name, amount_to_add) #incrase
+    new_stock = increase_raw_material(material_id, amount_to_add) #incrase (takes the id, not the name)
     
     if new_stock is not None:
         print_success(f"Stock updated! New level: {new_stock} units")# succesful restock
@@ -375,9 +378,9 @@ def create_batch():
     
     # Show what materials will be consumed
     print(f"\n📊 This batch will consume:") 
-    for _, row in recipe_df.iterrows():# itr through rec df 
-        total_needed = row['quantity_needed'] * quantity # calc needed quant
-        print(f"   • {row['material_name']}: {total_needed} units") # for each itr in df, prints mat name and quant needed
+    for material_name, quantity_needed in recipe_df[['material_name', 'quantity_needed']].itertuples(index=False, name=None):# itr through rec df 
+        total_needed = quantity_needed * quantity # calc needed quant
+        print(f"   • {material_name}: {total_needed} units") # for each itr in df, prints mat name and quant needed
     
     # Confirm with user
     if not get_yes_no_input("\nProceed with batch creation?"):# valid y/n input
@@ -769,9 +772,12 @@ def remove_recipe():
     backup_database(reason="before_recipe_delete")
     
     # Delete recipe
-    delete_recipe(product_name)
+    result = delete_recipe(product_name)
     
-    print_success(f"Recipe '{product_name}' deleted successfully!")
+    if result is not None:
+        print_success(f"Recipe '{product_name}' deleted successfully!")
+    else:
+        print_error("Failed to delete recipe.")
     pause()
 
 
@@ -879,6 +885,10 @@ def main():
     
     Why this order: Database must exist before backup check
     """
+
+    # inventory_app reports successes (batch added, restocked...) and warnings with
+    # logging.info / logging.warning - show them as plain lines, like the old prints
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     
     # Ensure database is initialized
     if not os.path.exists('data/inventory.db'):
@@ -888,6 +898,8 @@ def main():
     
     # Auto-backup on startup (if >24 hours since last)
     auto_backup_on_startup()
+    # open the first PostgreSQL connection before the menu shows (no-op on sqlite)
+    prewarm_connection()
     
     # Enter main menu loop
     main_menu()
@@ -7,12 +7,51 @@ functions dont let program crash if there are invalid inputs
 functions will be called in cli.py
 """
 
+import json
 import os
-import shutil
+import re
+import sqlite3
+import tempfile
+import threading
 import pandas as pd
-from datetime import datetime
+import xlsxwriter
+from datetime import date, datetime
 from tabulate import tabulate
 
+# pyarrow is optional - only needed for parquet exports
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    pa = None
+    pq = None
+
+# readline is optional (not on windows) - just importing it gives input() arrow-key
+# editing and up-arrow history, so re-typing a bad number is one keypress
+try:
+    import readline
+except ImportError:
+    readline = None
+
+# fcntl is optional (unix only) - used so two CLIs started together don't both run
+# the startup backup. without it the startup backup just always runs
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+    fcntl = None
+
+# zstandard is optional - without it backups are stored as plain .db copies
+try:
+    import zstandard as zstd
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+    zstd = None
+
 
 
 # INPUT VALIDATION
@@ -22,6 +61,11 @@ Functions that get validated user input for floats, int, yes/no, and optional ba
 
 """
 
+# input is checked against these before converting, so bad input is just a failed match
+# instead of float()/int() raising. also keeps out things float() accepts like 'nan' / '1e3'
+_FLOAT_RE = re.compile(r'-?(?:\d+(?:\.\d*)?|\.\d+)')
+_INT_RE = re.compile(r'-?\d+')
+
 
 def get_float_input(prompt, min_val=0, allow_zero=True):
     """
@@ -34,22 +78,23 @@ def get_float_input(prompt, min_val=0, allow_zero=True):
     return: the float but validated
     """
     while True:
-       
-        try:
-            value = float(input(prompt)) # the input
-            
-            if not allow_zero and value == 0: 
-                print("|ERROR| Value cannot be zero. Please try again.") # if zero not allowed, invalid input
-                continue
-            
-            if value < min_val:
-                print(f"|ERROR| Value must be at least {min_val}. Please try again.") # cant be less then min val
-                continue
-            
-            return value
-        
-        except ValueError:
+        raw = input(prompt).strip() # the input
+
+        if not _FLOAT_RE.fullmatch(raw):
             print("|ERROR| Invalid input. Please enter a valid number.")
+            continue
+
+        value = float(raw)
+
+        if not allow_zero and value == 0: 
+            print("|ERROR| Value cannot be zero. Please try again.") # if zero not allowed, invalid input
+            continue
+
+        if value < min_val:
+            print(f"|ERROR| Value must be at least {min_val}. Please try again.") # cant be less then min val
+            continue
+
+        return value
 
 
 
@@ -61,21 +106,23 @@ def get_int_input(prompt, min_val=0, allow_zero=True):
     returns int value. works same as float function
     """
     while True:
-        try:
-            value = int(input(prompt))
-            
-            if not allow_zero and value == 0:
-                print("|ERROR| Value cannot be zero. Please try again.")
-                continue
-            
-            if value < min_val:
-                print(f"|ERROR| Value must be at least {min_val}. Please try again.")
-                continue
-            
-            return value
-        
-        except ValueError:
+        raw = input(prompt).strip()
+
+        if not _INT_RE.fullmatch(raw):
             print("|ERROR| Invalid input. Please enter a valid whole number.")
+            continue
+
+        value = int(raw)
+
+        if not allow_zero and value == 0:
+            print("|ERROR| Value cannot be zero. Please try again.")
+            continue
+
+        if value < min_val:
+            print(f"|ERROR| Value must be at least {min_val}. Please try again.")
+            continue
+
+        return value
 
 
 
@@ -121,18 +168,21 @@ def get_optional_batch_id():
         if not user_input:
             return None  # autogenerate if no choice chosen
         
-        try:
-            batch_id = int(user_input) # batch_id now user input
-            if batch_id <= 0: #cant be negitive
-                print("|ERROR| Batch ID must be positive. Please try again.")
-                continue #reprompts
-            return batch_id
-        except ValueError:
+        if not _INT_RE.fullmatch(user_input):
             print("|ERROR| Invalid batch ID. Please enter a valid number.")
+            continue
+
+        batch_id = int(user_input) # batch_id now user input
+        if batch_id <= 0: #cant be negitive
+            print("|ERROR| Batch ID must be positive. Please try again.")
+            continue #reprompts
+        return batch_id
 
 
 # DATA DISPLAY
 
+TABULATE_MAX_ROWS = 200 # bigger tables skip tabulate's grid and use df.to_string
+
 
 def display_dataframe(df, title=None, empty_message="No data found."):
     """
@@ -148,9 +198,14 @@ def display_dataframe(df, title=None, empty_message="No data found."):
         print(f"\n{empty_message}\n")
         return
     
-    # tablefmt="grid" creates  boxes around data
-    # headers="keys" uses df column names
-    print("\n" + tabulate(df, headers='keys', tablefmt='grid', showindex=False))
+    if len(df) < TABULATE_MAX_ROWS:
+        # tablefmt="grid" creates  boxes around data
+        # headers="keys" uses df column names
+        print("\n" + tabulate(df, headers='keys', tablefmt='grid', showindex=False))
+    else:
+        # tabulate formats cell by cell in python, slow for long listings.
+        # pandas' own formatter does it column-wise, no boxes but much faster
+        print("\n" + df.to_string(index=False))
     print()  # extra spacing for readability
 
 
@@ -166,6 +221,33 @@ funcitons ensure folder exists and exports the df to csv
 
 """
 
+EXPORT_CHUNK_SIZE = 50_000 # rows written per to_csv call in export_to_csv
+
+
+def _optimize_for_export(df):
+    """
+    returns a copy of the df with smaller dtypes so there is less to format on export
+
+    - integer columns are downcast (int64 -> int32/int16/int8)
+    - repeated text columns (unit, category, supplier...) become categoricals
+
+    float columns are left alone, downcasting to float32 would change the values written out
+    """
+    df = df.copy()
+
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            df[col] = pd.to_numeric(series, downcast='integer')
+        elif (series.dtype == object or pd.api.types.is_string_dtype(series)) and len(series) > 0:
+            if series.nunique() / len(series) < 0.5: # low cardinality, mostly repeats
+                df[col] = series.astype('category')
+
+    return df
+
+
 def ensure_export_folder():
     """
 
@@ -173,8 +255,7 @@ def ensure_export_folder():
 
     folder is cleaner than csv files in root directory
     """
-    if not os.path.exists('exports'): #if folder doesnt exist it makes it
-        os.makedirs('exports')
+    os.makedirs('exports', exist_ok=True) # one mkdir call, no error if the folder is already there
 
 
 
@@ -192,12 +273,22 @@ def export_to_csv(df, filename_prefix):
 
     """
     ensure_export_folder() # makes sure folder exists
+    df = _optimize_for_export(df) # smaller dtypes, less to format
 
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S') # current time timestamp
     filename = f"{filename_prefix}_{timestamp}.csv" # file name with prefix and timestamp
     filepath = os.path.join('exports', filename) # full path to file
 
-    df.to_csv(filepath, index=False) # exports to csv without index
+    # always pandas' to_csv: these are reports people open in spreadsheets and scripts,
+    # and pyarrow's csv writer formats values differently (quotes every string,
+    # true/false, 1001 instead of 1001.0, timestamps with .000000) - the file would
+    # change depending on whether pyarrow happens to be installed.
+    # write in chunks through one buffered file handle so big reports
+    # don't get formatted into a single giant string in memory
+    with open(filepath, 'w', newline='', buffering=1 << 20) as f:
+        df.iloc[:0].to_csv(f, index=False) # header row only
+        for start in range(0, len(df), EXPORT_CHUNK_SIZE):
+            df.iloc[start:start + EXPORT_CHUNK_SIZE].to_csv(f, index=False, header=False) # exports to csv without index
 
     return filepath
 
@@ -219,6 +310,7 @@ def export_to_excel(df, filename_prefix):
              creates 'exports/inventory_20260203_143022.xlsx'
     """
     ensure_export_folder() # makes sure exports/ folder exists, creates if needed
+    df = _optimize_for_export(df) # smaller dtypes, less to format
 
     # Create timestamp for unique filename (format: YYYYMMDD_HHMMSS)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -230,13 +322,73 @@ def export_to_excel(df, filename_prefix):
     filepath = os.path.join('exports', filename)
 
     # Export DataFrame to Excel file
-    # - index=False: Don't include row numbers in the export
-    # - engine='openpyxl': Use openpyxl library for .xlsx format (required for Excel)
-    df.to_excel(filepath, index=False, engine='openpyxl')
+    # - xlsxwriter constant_memory mode streams each row to disk as it's written instead of
+    #   building the whole workbook in memory first (like openpyxl does)
+    # - constant_memory only keeps the current row, so rows have to be written in order.
+    #   pandas' to_excel writes column by column, which is why rows are written by hand here
+    # - NaN/None become empty cells, same as to_excel
+    # - datetimes get the same number formats to_excel uses, without one excel shows
+    #   them as serial numbers (46023). default_date_format covers datetime values,
+    #   plain dates (postgres DATE columns) are written again below with a date-only format
+    workbook = xlsxwriter.Workbook(filepath, {'constant_memory': True,
+                                              'default_date_format': 'yyyy-mm-dd hh:mm:ss'})
+    try:
+        worksheet = workbook.add_worksheet()
+        date_format = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+        worksheet.write_row(0, 0, [str(col) for col in df.columns]) # header row
+
+        rows = df.astype(object).where(df.notna(), None) # plain python values, None for missing
+        # columns holding plain dates, checked once instead of per cell
+        date_columns = []
+        for col_num, col in enumerate(rows.columns):
+            first = rows[col].first_valid_index()
+            value = rows[col].loc[first] if first is not None else None
+            if isinstance(value, date) and not isinstance(value, datetime):
+                date_columns.append(col_num)
+
+        for row_num, row in enumerate(rows.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(row_num, 0, row)
+            for col_num in date_columns:
+                if row[col_num] is not None:
+                    worksheet.write_datetime(row_num, col_num, row[col_num], date_format)
+    finally:
+        workbook.close()
 
     return filepath # Return path so Flask can send the file to browser
 
 
+def export_to_parquet(df, filename_prefix):
+    """
+    Exports the dataframe to a zstd compressed Parquet file with timestamp
+
+    for archiving / reloading data in python (pd.read_parquet), not for people -
+    csv and excel stay the formats for anyone opening the file in a spreadsheet.
+    parquet is columnar and compressed so files are a fraction of the csv size and
+    keep their dtypes. dictionary encoding makes repeated columns (unit, category,
+    supplier) almost free
+
+    inputs: the DF and file name prefix
+
+    returns: the filepath to the created .parquet file
+    """
+    if not PYARROW_AVAILABLE:
+        raise ImportError(
+            "Parquet export needs pyarrow. "
+            "Install it with: pip install pyarrow"
+        )
+
+    ensure_export_folder() # makes sure folder exists
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S') # current time timestamp
+    filename = f"{filename_prefix}_{timestamp}.parquet"
+    filepath = os.path.join('exports', filename)
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, filepath, compression='zstd', compression_level=3, use_dictionary=True)
+
+    return filepath
+
+
 def optional_export_to_csv(df, default_prefix):
     """
     Asks user if they want to export dataframe to csv.
@@ -273,12 +425,93 @@ also function to check last backup time for auto-backup on startup
 """
 
 
+BACKUP_DIR = os.path.join('data', 'backups')
+BACKUP_MANIFEST = os.path.join(BACKUP_DIR, 'manifest.json')
+
+# retention: every backup from the last 24h, then the newest backup of each of the
+# last 7 days, 4 weeks and 3 months. anything else gets deleted after a backup
+KEEP_DAILY = 7
+KEEP_WEEKLY = 4
+KEEP_MONTHLY = 3
+
+# one backup at a time in this process - the startup backup runs on a background
+# thread and could overlap a "before_batch" backup, and both prune the same folder
+_backup_lock = threading.Lock()
+
+
 def ensure_backup_folder():
     """Creates data/backups/ folder if it doesn't exist."""
 
-    backup_dir = os.path.join('data', 'backups')# path to backup dir
-    if not os.path.exists(backup_dir): # if it doesnt exist, make it
-        os.makedirs(backup_dir)
+    os.makedirs(BACKUP_DIR, exist_ok=True) # one mkdir call, no exists() check that can race
+
+
+def _scan_backups():
+    """returns (filename, mtime) for every backup file in data/backups/, newest first"""
+    with os.scandir(BACKUP_DIR) as entries:
+        backups = [(e.name, e.stat().st_mtime) for e in entries
+                   if e.is_file() and e.name.endswith(('.db', '.db.zst'))]
+    backups.sort(key=lambda b: b[1], reverse=True)
+    return backups
+
+
+def _write_backup_manifest(backups):
+    """
+    writes data/backups/manifest.json listing the backups (newest first)
+
+    written to a temp file then renamed, so a crash never leaves a half written manifest
+    """
+    manifest = {'backups': [{'file': name, 'created': mtime} for name, mtime in backups]}
+    tmp_path = BACKUP_MANIFEST + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, BACKUP_MANIFEST)
+
+
+def _prune_backups():
+    """
+    deletes old backups so data/backups/ doesn't grow forever, then rewrites the manifest
+
+    keeps everything from the last 24 hours, plus the newest backup of each of the
+    last KEEP_DAILY days, KEEP_WEEKLY weeks and KEEP_MONTHLY months
+
+    returns list of deleted filenames
+    """
+    backups = _scan_backups() # newest first
+    now = datetime.now().timestamp()
+
+    keep = set()
+    days, weeks, months = [], [], [] # periods seen so far, newest first
+    for name, mtime in backups:
+        if now - mtime < 24 * 3600:
+            keep.add(name)
+
+        created = datetime.fromtimestamp(mtime)
+        day = created.date()
+        week = created.isocalendar()[:2] # (year, week number)
+        month = (created.year, created.month)
+
+        # first backup seen in a period is the newest one of that period
+        if day not in days and len(days) < KEEP_DAILY:
+            days.append(day)
+            keep.add(name)
+        if week not in weeks and len(weeks) < KEEP_WEEKLY:
+            weeks.append(week)
+            keep.add(name)
+        if month not in months and len(months) < KEEP_MONTHLY:
+            months.append(month)
+            keep.add(name)
+
+    deleted = []
+    for name, _ in backups:
+        if name not in keep:
+            try:
+                os.remove(os.path.join(BACKUP_DIR, name))
+                deleted.append(name)
+            except OSError as e:
+                print(f"|WARNING| Could not remove old backup {name}: {e}")
+
+    _write_backup_manifest([b for b in backups if b[0] not in deleted])
+    return deleted
 
 
 
@@ -288,10 +521,19 @@ def backup_database(reason="manual"):
 
     ciritcal for protecting against accidental deletions, allows rollback if batch creation goes wrong
 
+    backups are zstd compressed (.db.zst) when zstandard is installed, sqlite files
+    compress very well so this keeps data/backups/ small. use restore_backup() to get a .db back
+
     input: reason for backup (for filename clarity)
 
     returns: path to backup file, or None if failed
     """
+    with _backup_lock:
+        return _backup_database(reason)
+
+
+def _backup_database(reason):
+    """does the actual backup, see backup_database()"""
     ensure_backup_folder() # make sure backup folder exists
     
     source = 'data/inventory.db' # source database file
@@ -304,11 +546,36 @@ def backup_database(reason="manual"):
     
     backup_filename = f"inventory_backup_{reason}_{timestamp}.db" # backup file name
 
-    backup_path = os.path.join('data', 'backups', backup_filename) # path to file
+    backup_path = os.path.join(BACKUP_DIR, backup_filename) # path to file
     
     try:
-        shutil.copy2(source, backup_path)# copys the source(database) to backup path
+        # sqlite online backup API copies page by page under SQLite's own locking,
+        # so an in-flight write can't leave a torn copy like a raw file copy can.
+        # pages=1000 copies in steps, so other connections can get the lock in between
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(backup_path)
+        try:
+            src.backup(dst, pages=1000)
+        finally:
+            dst.close()
+            src.close()
+
+        if ZSTD_AVAILABLE:
+            # stream the snapshot through zstd, then drop the uncompressed copy
+            compressed_path = backup_path + '.zst'
+            cctx = zstd.ZstdCompressor(level=3, threads=-1)
+            with open(backup_path, 'rb') as fin, open(compressed_path, 'wb') as fout:
+                cctx.copy_stream(fin, fout)
+            os.remove(backup_path)
+            backup_path = compressed_path
+            backup_filename += '.zst'
+
         print(f" Database backed up: {backup_filename}") 
+
+        deleted = _prune_backups() # rotate old backups out, updates the manifest
+        if deleted:
+            print(f" Removed {len(deleted)} old backup(s)")
+
         return backup_path 
     
     except Exception as e:
@@ -316,45 +583,97 @@ def backup_database(reason="manual"):
         return None
 
 
+def restore_backup(backup_path, destination='data/inventory.db'):
+    """
+    restores a backup file over the database
+
+    handles both compressed (.db.zst) and plain (.db) backups
+    run it with the app / CLI stopped, they keep sqlite connections open between queries
+
+    input: path to backup file, and where to restore it (defaults to the live database)
+
+    returns: destination path, or None if failed
+    """
+    if not os.path.exists(backup_path):
+        print(f"|ERROR| Backup file not found: {backup_path}")
+        return None
+
+    source = backup_path
+    try:
+        if backup_path.endswith('.zst'):
+            if not ZSTD_AVAILABLE:
+                raise ImportError(
+                    "Backup is zstd compressed but zstandard is not installed. "
+                    "Install it with: pip install zstandard"
+                )
+            # decompress to a temp file first, never straight over the live database -
+            # a leftover -wal file next to it would get replayed onto the restored copy
+            fd, source = tempfile.mkstemp(suffix='.db', dir=os.path.dirname(destination) or '.')
+            dctx = zstd.ZstdDecompressor()
+            with open(backup_path, 'rb') as fin, os.fdopen(fd, 'wb') as fout:
+                dctx.copy_stream(fin, fout)
+
+        # copy in through sqlite's backup API, which writes through the destination's own
+        # journal / WAL, so any -wal / -shm files already there stay consistent with it
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(destination)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+
+        print(f" Database restored from: {os.path.basename(backup_path)}")
+        return destination
+
+    except Exception as e:
+        print(f"|ERROR| Restore failed: {e}")
+        return None
+
+    finally:
+        if source != backup_path and os.path.exists(source):
+            os.remove(source) # decompressed temp copy
+
+
 def get_last_backup_time():
     """
 
     
   
 
-
     checks the data/backups/ folder for latest backup file
 
+    reads data/backups/manifest.json (kept up to date by backup_database) so it doesnt
+    have to list the folder. falls back to scanning the folder if the manifest is
+    missing, broken, or points at a file that's gone
+
     returns the time stamp of latest backup, or None if no backups exist
       Used to trigger daily auto-backups on CLI startup
     """
-    backup_dir = os.path.join('data', 'backups')# path to backup dir
+    backup_dir = BACKUP_DIR # path to backup dir
     
     if not os.path.exists(backup_dir):# if no backup dir, return none
         return None
-    
-    backups = [f for f in os.listdir(backup_dir) if f.endswith('.db')] #iterates through file in backup dir and get .db files
+
+    try:
+        with open(BACKUP_MANIFEST) as f:
+            backups = json.load(f)['backups'] # newest first
+        if backups and os.path.exists(os.path.join(backup_dir, backups[0]['file'])):
+            return datetime.fromtimestamp(backups[0]['created'])
+    except (OSError, ValueError, KeyError, IndexError, TypeError):
+        pass # no manifest yet (or unreadable) - scan the folder instead
+
+    backups = _scan_backups() # newest first
     
     if not backups: # if no backups
         return None
     
-  
-    for f in backups:
-        backup_paths = os.path.join(backup_dir, f)  # full path to each backup file
-    latest_backup = max(backup_paths, key=os.path.getmtime)# get the latest backup file by modification time
-    
-    return datetime.fromtimestamp(os.path.getmtime(latest_backup))
+    return datetime.fromtimestamp(backups[0][1])
 
 
-def auto_backup_on_startup():
+def _backup_if_stale():
     """
     Creates backup if last backup is >24 hours old.
-    
-    Why run on startup: Ensures fresh backup exists before user
-    makes any changes. Safety net for the day's operations.
-    
-    Design decision: Non-blocking - prints message but doesn't
-    stop user from continuing if backup fails
 
     uses try except to prevent crashes
      - Wraps everything in try-except (catches unexpected errors) 
@@ -388,6 +707,46 @@ def auto_backup_on_startup():
            pass
 
 
+def _run_startup_backup():
+    """
+    runs _backup_if_stale() holding data/backups/.lock, so if two CLIs start at
+    the same time only one of them backs up (the other one just skips)
+    """
+    if not FCNTL_AVAILABLE:
+        _backup_if_stale()
+        return
+
+    try:
+        ensure_backup_folder()
+        with open(os.path.join(BACKUP_DIR, '.lock'), 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return # another process is already backing up
+            _backup_if_stale() # lock is released when the file closes
+    except OSError as e:
+        print(f"|ERROR|  Backup check skipped: {e}")
+
+
+def auto_backup_on_startup():
+    """
+    Creates backup if last backup is >24 hours old.
+    
+    Why run on startup: Ensures fresh backup exists before user
+    makes any changes. Safety net for the day's operations.
+    
+    Design decision: Non-blocking - the check and backup run on a background
+    thread, so the menu comes up straight away instead of waiting on the copy +
+    compression. returns the thread
+
+    not a daemon thread on purpose: if the user exits mid-backup, python waits for
+    the backup to finish instead of killing it and leaving a half written file
+    """
+    thread = threading.Thread(target=_run_startup_backup, name='startup-backup')
+    thread.start()
+    return thread
+
+
 # PRETTY PRINTING HELPERS
 """
 will help with printing messages to user in consistent format
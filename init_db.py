@@ -38,7 +38,7 @@ except ImportError:
 
 DATABASE_URL = os.getenv('DATABASE_URL')  # ← THEN read it
 
-from database import get_connection
+from database import get_connection, create_indexes
 
 
 
@@ -108,7 +108,7 @@ def init_database():
        material_name TEXT, 
        quantity_needed REAL, 
        FOREIGN KEY (material_id) REFERENCES raw_materials(material_id), 
-       FOREIGN KEY (recipe_id) REFERENCES recipes(recipe_id) 
+       FOREIGN KEY (recipe_id) REFERENCES recipes(recipe_id) ON DELETE CASCADE 
    ) 
    """) 
     
@@ -175,6 +175,15 @@ def init_database():
     )
     """)
    
+
+   # ======================================== 
+   # INDEXES 
+   # ======================================== 
+   # same list create_database() uses for SQLite, kept in database.SCHEMA_INDEXES
+   create_indexes(cursor)
+
+   print("  ✅ indexes created") 
+
     
    # ======================================== 
    # Save all changes 
@@ -3,13 +3,42 @@ Matcha Inventory Management System
 Core functions for database operations and queries
 """
 
-from database import get_db_connection
+from database import get_db_connection, create_indexes
 import pandas as pd
 from datetime import datetime
 import os
 import logging
 
 _UNSET = object()  # sentinel for optional fields that can be explicitly set to None
+READ_CHUNK_SIZE = 10_000  # rows per chunk for pd.read_sql_query on full-table reads
+
+
+def _iter_chunks(query, chunksize):
+    """
+    yields the query's rows as DataFrames of up to chunksize rows, on its own connection
+    (released once the loop finishes or the generator is dropped). for callers that can
+    work chunk by chunk (export, totals...) instead of holding the whole table at once
+    """
+    db = get_db_connection()
+    try:
+        yield from pd.read_sql_query(query, db.conn, chunksize=chunksize)
+    finally:
+        db.close()
+
+
+def _read_df(db, query, params=()):
+    """
+    runs a SELECT on db's own cursor and returns the rows as a DataFrame
+
+    lighter than pd.read_sql_query for the small lists the app shows (no pandas sql
+    layer, no warning about psycopg2 not being sqlalchemy), and goes through db.execute
+    so %s params work on sqlite too
+    """
+    cursor = db.cursor()
+    db.execute(cursor, query, params)
+    columns = [desc[0] for desc in cursor.description]
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
 
 #LOGGING SET UP
 
@@ -43,9 +72,10 @@ def view_logs():
     query = """SELECT action, details, timestamp 
                 FROM audit_log 
                 ORDER BY timestamp DESC LIMIT 200"""
-    df = pd.read_sql_query(query, db.conn)
-    db.close()
-    return df
+    try:
+        return _read_df(db, query)
+    finally:
+        db.close()
 
 # ========================
 # DATABASE SETUP
@@ -53,7 +83,7 @@ def view_logs():
 
 # NOTE: This function only for local SQLite - use init_db.py for PostgreSQL
 def create_database():
-    """Creates database with raw_materials, recipes, and ready_to_ship tables"""
+    """Creates database with raw_materials, recipes, recipe_materials, batches, batch_materials and audit_log tables"""
     import sqlite3
     conn = sqlite3.connect('data/inventory.db')
     cursor = conn.cursor()
@@ -94,7 +124,7 @@ def create_database():
                    material_name TEXT,
                    quantity_needed REAL,
                    FOREIGN KEY (material_id) REFERENCES raw_materials(material_id),
-                   FOREIGN KEY (recipe_id) REFERENCES recipes(recipe_id)
+                   FOREIGN KEY (recipe_id) REFERENCES recipes(recipe_id) ON DELETE CASCADE
                    
                    )
                    """)
@@ -142,6 +172,9 @@ def create_database():
                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
                    )""")
 
+    # Indexes - same list init_db.py uses for PostgreSQL (database.SCHEMA_INDEXES)
+    create_indexes(cursor)
+
     # Save all table creations to the database
     conn.commit()
     conn.close()
@@ -160,19 +193,23 @@ def add_raw_material(name, category, stock_level, unit, reorder_level, cost_per_
     cursor = db.cursor()
 
     try:
-        db.execute(cursor, "SELECT material_id FROM raw_materials WHERE LOWER(name) = LOWER(%s)", (name,))
-        if cursor.fetchone():
-            return "duplicate"
-
+        # duplicate check and insert in one statement: only inserts if no material has
+        # this name (case insensitive), and the new id comes back with it.
+        # not ON CONFLICT - older databases don't have the unique LOWER(name) index it needs
         db.execute(cursor, """
             INSERT INTO raw_materials (name, category, stock_level, unit, reorder_level, cost_per_unit, supplier, is_housemade)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-
-                        """, (name, category, stock_level, unit, reorder_level, cost_per_unit, supplier, is_housemade))
+            SELECT %s,%s,%s,%s,%s,%s,%s,%s
+            WHERE NOT EXISTS (SELECT 1 FROM raw_materials WHERE LOWER(name) = LOWER(%s))
+            RETURNING material_id
+                        """, (name, category, stock_level, unit, reorder_level, cost_per_unit, supplier, is_housemade, name))
+        row = cursor.fetchone()
+        if row is None: # nothing inserted, name already taken
+            return "duplicate"
+        material_id = row[0]
 
         db.commit()
-        print(f"Added {name} to raw materials")
-        return db.get_last_insert_id(cursor)
+        logging.info("Added %s to raw materials", name)
+        return material_id
 
     except Exception as e:
         logging.error(f"Error: {e}")
@@ -183,12 +220,89 @@ def add_raw_material(name, category, stock_level, unit, reorder_level, cost_per_
 
 
 
-def get_low_stock_materials():
-    "Return raw materials below if low on stock"
+def run_maintenance():
+    """
+    refreshes the query planner's table statistics (ANALYZE), so it keeps picking the
+    indexes once tables have grown. sqlite also gets PRAGMA optimize.
+    cheap on tables this size - called after bulk inserts, safe to run any time (cron etc).
+    returns True/False
+    """
+    db = get_db_connection()
+    cursor = db.cursor()
+
+    try:
+        db.execute(cursor, "ANALYZE")
+        if not db.is_postgres:
+            db.execute(cursor, "PRAGMA optimize")
+        db.commit()
+        return True
+    except Exception as e:
+        logging.error(f"Error running maintenance: {e}")
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def add_raw_materials_bulk(materials):
+    """
+    Adds many raw materials in one transaction instead of one connection + commit per material.
+
+    materials: list of dicts with the same keys as add_raw_material's params
+        ('name', 'category', 'stock_level', 'unit', 'reorder_level', and optionally
+        'cost_per_unit', 'supplier', 'is_housemade')
 
+    Names already in raw_materials (case insensitive), or repeated in the list, are skipped.
+    Returns number of materials inserted, or None on error (nothing is inserted).
+    """
     db = get_db_connection()
     cursor = db.cursor()
 
+    try:
+        rows = [(material['name'], material['category'], material['stock_level'], material['unit'],
+                 material['reorder_level'], material.get('cost_per_unit'), material.get('supplier'),
+                 material.get('is_housemade', False), material['name'])
+                for material in materials]
+
+        db.execute(cursor, "SELECT COUNT(*) FROM raw_materials")
+        count_before = cursor.fetchone()[0]
+
+        # same duplicate check as add_raw_material, done by the database so LOWER() folds
+        # case the same way the unique name index does. each row's check sees the rows
+        # inserted before it, so names repeated in the list are skipped too
+        db.executemany(cursor, """
+            INSERT INTO raw_materials (name, category, stock_level, unit, reorder_level, cost_per_unit, supplier, is_housemade)
+            SELECT %s,%s,%s,%s,%s,%s,%s,%s
+            WHERE NOT EXISTS (SELECT 1 FROM raw_materials WHERE LOWER(name) = LOWER(%s))
+        """, rows)
+
+        db.execute(cursor, "SELECT COUNT(*) FROM raw_materials")
+        inserted = cursor.fetchone()[0] - count_before
+
+        db.commit()
+        logging.info(f"Added {inserted} materials to raw materials")
+        if inserted < len(rows):
+            logging.info(f"Skipped {len(rows) - inserted} duplicate materials")
+        if inserted:
+            run_maintenance() # table just grew a lot at once, refresh planner stats
+        return inserted
+
+    except Exception as e:
+        logging.error(f"Error adding materials in bulk: {e}")
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+def get_low_stock_materials(chunksize=None, limit=None):
+    """
+    Return raw materials below if low on stock
+    chunksize=N returns an iterator of DataFrames (N rows each) instead, see _iter_chunks
+    limit=K only returns the K lowest (by stock / reorder level) - the low stock index is
+    already in that order, so the database stops after K rows instead of sorting everything
+    """
+
     query = """
 
     SELECT name, category, stock_level, reorder_level, unit, cost_per_unit, supplier
@@ -196,25 +310,40 @@ def get_low_stock_materials():
     WHERE stock_level <= reorder_level
     ORDER BY (stock_level / NULLIF(reorder_level, 0))
     """
-    result = pd.read_sql_query(query, db.conn)
-    db.close()
-    return result
-
+    if limit is not None:
+        query += f"LIMIT {int(limit)}\n" # int() - never put caller text in the sql
+    if chunksize:
+        return _iter_chunks(query, chunksize)
 
-def get_all_materials():
-    "Returns all materials"
     db = get_db_connection()
-    cursor = db.cursor()
+    try:
+        return _read_df(db, query)
+    finally:
+        db.close()
+
+
+def get_all_materials(chunksize=None):
+    """
+    Returns all materials
+    chunksize=N returns an iterator of DataFrames (N rows each) instead, see _iter_chunks
+    """
 
     query = """
     SELECT name, category, stock_level, unit, reorder_level, cost_per_unit, supplier, is_housemade
     FROM raw_materials
     ORDER BY category, name
     """
+    if chunksize:
+        return _iter_chunks(query, chunksize)
 
-    result = pd.read_sql_query(query, db.conn)
-    db.close()
-    return result
+    db = get_db_connection()
+    try:
+        # read in chunks so pandas builds small frames as rows arrive
+        # instead of buffering the whole table as python objects first
+        chunks = pd.read_sql_query(query, db.conn, chunksize=READ_CHUNK_SIZE)
+        return pd.concat(chunks, ignore_index=True)
+    finally:
+        db.close()
 
 
 
@@ -254,7 +383,8 @@ def update_raw_material(material_id, name=None, category=None, stock_level=None,
             field[key] = value 
 
     if not field: #empty dictionary, no fields to update
-        print("No fields to update")
+        logging.info("No fields to update")
+        db.close()
         return
 
     try:
@@ -296,44 +426,93 @@ def increase_raw_material(material_id, increase_amount):
 
     try:
 
+        # one round trip: UPDATE ... RETURNING hands back the new stock level,
+        # no SELECT before (existence check) or after (new level) needed
         db.execute(cursor, """
-        SELECT material_id, stock_level, unit
-        FROM raw_materials
+        UPDATE raw_materials
+        SET stock_level = stock_level + %s
         WHERE material_id = %s
-        """, (material_id,))
+        RETURNING stock_level, unit
+        """, (increase_amount, material_id,) )
         result = cursor.fetchone()
-        # gets the result from the query in form of a tuple
 
         if not result:
-            print(f"Material with ID {material_id} not found in raw_materials")
+            logging.warning("Material with ID %s not found in raw_materials", material_id)
+            db.rollback()
             return None
-        # if the query doesnt work, tells user
+        # if the update matched no rows, tells user
 
-        (material_id, current_stock, unit) = result # breaks tuple down to three new variables
+        (new_stock_level, unit) = result # breaks tuple down to two new variables
+        new_stock_level = float(new_stock_level) # sqlite RETURNING gives the value before REAL affinity is applied
+        db.commit()
 
-        db.execute(cursor, """
+        logging.info("Succesfully added, material with id:%s is now at %s", material_id, new_stock_level)
+        return new_stock_level
+
+    except Exception as e:
+        logging.error(f"Error: {e}")
+        db.rollback()
+        return None
+
+    finally:
+        db.close()
+
+
+
+def _change_stock_levels(db, cursor, amounts, sign=1, only_if_enough=False, returning=("material_id",)):
+    """
+    adds (sign=1) or takes away (sign=-1) {material_id: amount} from stock_level in one
+    UPDATE ... FROM (VALUES ...), on the caller's connection - the caller commits.
+    only_if_enough=True leaves rows alone that don't have enough stock to take away.
+
+    returns the RETURNING rows (the raw_materials columns in returning) for rows that changed
+    """
+    values_sql = ", ".join(["(%s, %s)"] * len(amounts))
+    params = [value for item in amounts.items() for value in item]
+    enough_sql = "AND raw_materials.stock_level >= changed.column2" if only_if_enough else ""
+    returning_sql = ", ".join(f"raw_materials.{column}" for column in returning)
+    # (VALUES ...) columns are column1 = material_id, column2 = amount on both databases
+    db.execute(cursor, f"""
         UPDATE raw_materials
-        SET stock_level = stock_level + %s
-        WHERE material_id = %s
+        SET stock_level = raw_materials.stock_level {'+' if sign > 0 else '-'} changed.column2
+        FROM (VALUES {values_sql}) AS changed
+        WHERE raw_materials.material_id = changed.column1
+        {enough_sql}
+        RETURNING {returning_sql}
+    """, tuple(params))
+    return cursor.fetchall()
 
-        """, (increase_amount, material_id,) )
-        db.commit()
 
-        #get new stock level
-        db.execute(cursor, """
-        SELECT stock_level
-        FROM raw_materials
-        WHERE material_id = %s
 
-         """, (material_id,))
+def increase_raw_materials(amounts):
+    """
+    restocks many materials at once (e.g. a whole delivery): one UPDATE, one commit,
+    instead of an increase_raw_material() call (and commit) per material.
 
-        new_stock_level = cursor.fetchone()[0] # fetchone() returns a tuple, so get the first and only value in tuple instead of tuple
-        db.close()
-        print(f"Succesfully added, material with id:{material_id} is now at {new_stock_level}")
-        return new_stock_level
+    amounts: {material_id: amount_to_add} (or a list of (material_id, amount) pairs)
+    returns {material_id: new_stock_level} for the materials that exist, or None on error
+    """
+    totals = {}
+    for material_id, amount in (amounts.items() if isinstance(amounts, dict) else amounts):
+        totals[int(material_id)] = totals.get(int(material_id), 0) + amount
+    if not totals:
+        return {}
+
+    db = get_db_connection()
+    cursor = db.cursor()
+
+    try:
+        rows = _change_stock_levels(db, cursor, totals, returning=("material_id", "stock_level"))
+        new_levels = {material_id: float(stock_level) for material_id, stock_level in rows}
+        db.commit()
+
+        for material_id in totals.keys() - new_levels.keys():
+            logging.warning("Material with ID %s not found in raw_materials", material_id)
+        logging.info("Restocked %s materials", len(new_levels))
+        return new_levels
 
     except Exception as e:
-        logging.error(f"Error: {e}")
+        logging.error(f"Error restocking materials: {e}")
         db.rollback()
         return None
 
@@ -370,8 +549,6 @@ def get_raw_material(name):
 def get_all_materials_with_id():
 
     db = get_db_connection()
-    cursor = db.cursor()
-
 
     try:
 
@@ -381,15 +558,16 @@ def get_all_materials_with_id():
         ORDER BY category, name
         """
 
-        result = pd.read_sql_query(query, db.conn)
-        db.close()
+        result = _read_df(db, query)
         return result
 
     except Exception as e:
         logging.error(f"error getting all materials with id: {e}")
-        db.close()
         return None
 
+    finally:
+        db.close()
+
 def decrease_raw_material(material_id, decrease_amount):
     """Decreases amount of material given its material_id and amount to subtract"""
 
@@ -397,41 +575,38 @@ def decrease_raw_material(material_id, decrease_amount):
     cursor = db.cursor()
 
     try:
+        # stock check and deduction in one atomic statement, so two users can't
+        # both pass a separate SELECT check and overdraw the stock
         db.execute(cursor, """
-        SELECT material_id, stock_level, unit
-        FROM raw_materials
-        WHERE material_id = %s
-        """, (material_id,))
+        UPDATE raw_materials
+        SET stock_level = stock_level - %s
+        WHERE material_id = %s AND stock_level >= %s
+        RETURNING stock_level, unit
+        """, (decrease_amount, material_id, decrease_amount))
         result = cursor.fetchone()
 
         if not result:
-            print(f"Material with ID {material_id} not found in raw_materials")
-            return None
-
-        (material_id, current_stock, unit) = result
+            db.rollback()
+            # nothing updated - find out why (only runs on the failure path)
+            db.execute(cursor, """
+            SELECT stock_level, unit
+            FROM raw_materials
+            WHERE material_id = %s
+            """, (material_id,))
+            row = cursor.fetchone()
 
-        # Check if there's enough stock
-        if current_stock < decrease_amount:
-            print(f"Insufficient stock: Material with ID {material_id} has {current_stock} {unit}, but {decrease_amount} {unit} is needed")
+            if not row:
+                logging.warning("Material with ID %s not found in raw_materials", material_id)
+            else:
+                current_stock, unit = row
+                logging.warning("Insufficient stock: Material with ID %s has %s %s, but %s %s is needed", material_id, current_stock, unit, decrease_amount, unit)
             return None
 
-        db.execute(cursor, """
-        UPDATE raw_materials
-        SET stock_level = stock_level - %s
-        WHERE material_id = %s
-        """, (decrease_amount, material_id))
-
+        (new_stock_level, unit) = result
+        new_stock_level = float(new_stock_level)
         db.commit()
 
-        # Get new stock level
-        db.execute(cursor, """
-        SELECT stock_level
-        FROM raw_materials
-        WHERE material_id = %s
-        """, (material_id,))
-
-        new_stock_level = cursor.fetchone()[0]
-        print(f"Successfully deducted {decrease_amount} {unit} from material with ID :{material_id}. New stock level: {new_stock_level} {unit}")
+        logging.info("Successfully deducted %s %s from material with ID :%s. New stock level: %s %s", decrease_amount, unit, material_id, new_stock_level, unit)
         return new_stock_level
 
     except Exception as e:
@@ -492,8 +667,8 @@ def get_housemade_materials():
     """
     returns all materials in RM that are is_housemade == True
     """
+    db = get_db_connection()
     try:
-        db = get_db_connection()
         query = """
         SELECT name, stock_level, unit
         FROM raw_materials
@@ -501,8 +676,7 @@ def get_housemade_materials():
         ORDER BY name
 
         """
-        result = pd.read_sql_query(query, db.conn)
-        db.close()
+        result = _read_df(db, query)
         return result
 
     except Exception as e:
@@ -546,6 +720,9 @@ def add_to_batches(product_name, quantity, notes=None, batch_id=None, deduct_res
     if finished, deduction is deferred until promotion time for planned batches, happens immediately for ready batches.
     """
     # Connect to the database
+    # everything below is one transaction: nothing autocommits, the single db.commit()
+    # at the end makes the batch row, stock deduction and batch_materials visible together
+    # (one commit = one disk flush), and any error rolls all of it back
     db = get_db_connection()
     cursor = db.cursor()
 
@@ -553,10 +730,18 @@ def add_to_batches(product_name, quantity, notes=None, batch_id=None, deduct_res
 
     try:
 
-        #get recipe data frame
-        recipe_df = get_recipe(product_name)
+        if not db.is_postgres:
+            # sqlite: take the write lock now. the implicit transaction sqlite3 opens starts as
+            # a reader and upgrades at the first write, which can fail with "database is locked"
+            # halfway through if another writer got in first. (postgres locks per row, no need)
+            db.execute(cursor, "BEGIN IMMEDIATE")
+
+        #get recipe materials (material_id, material_name, quantity_needed) - read in this
+        # transaction, so a recipe edited by another process is seen straight away
+        _, rows = _recipe_rows(db, cursor, product_name)
+        recipe_rows = [(material_id, material_name, quantity_needed) for _, _, material_id, material_name, quantity_needed in rows]
 
-        if recipe_df is None or recipe_df.empty:
+        if not recipe_rows:
             raise ValueError(
                 f"Recipe '{product_name}' has no materials. "
                 "A material may have been deleted — please recreate it or update the recipe."
@@ -581,31 +766,25 @@ def add_to_batches(product_name, quantity, notes=None, batch_id=None, deduct_res
 
                 #add to batches
 
-                # check if batch_id already exists
-
-            db.execute(cursor, """
-                SELECT 1
-                FROM batches
-                WHERE batch_id = %s
-            """, (batch_id,))
-            if cursor.fetchone():
-                raise ValueError(f"Batch ID {batch_id} already exists.")
-
-
-
-            
+                # if batch_id already exists the insert does nothing and returns no row -
+                # one statement instead of a SELECT check then the INSERT
             db.execute(cursor, """
             INSERT INTO batches (batch_id, product_name, quantity, date_completed, status, notes, expiration_date, planned_completion_date, batch_type)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (batch_id) DO NOTHING
+            RETURNING batch_id
             """, (batch_id, product_name, quantity, date_completed, status, notes, expiration_date, planned_completion_date, batch_type))
+            if cursor.fetchone() is None:
+                raise ValueError(f"Batch ID {batch_id} already exists.")
 
         
         else:#batch_id is None, let database auto assign id
             db.execute(cursor, """
             INSERT INTO batches (product_name, quantity, date_completed, status, notes, expiration_date, planned_completion_date, batch_type)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING batch_id
             """, (product_name, quantity, date_completed, status, notes, expiration_date, planned_completion_date, batch_type))
-            batch_id = db.get_last_insert_id(cursor)
+            batch_id = cursor.fetchone()[0] # new id comes back with the insert, no extra query
                
 
 
@@ -615,57 +794,63 @@ def add_to_batches(product_name, quantity, notes=None, batch_id=None, deduct_res
         if deduct_resources and not defer_deduction: # if defer_deduction, will be deducted later in promotion from planned. 
 
 
-            #check in there is needed resources
-            for _, row in recipe_df.iterrows(): #iterate through each row of recipe df
-                material_id_recipe = row['material_id'] #get id
-                material_name = row['material_name'] #get material name
-                quantity_needed = row['quantity_needed'] # needed amount
-
-                material_info = get_raw_material(material_name)
-                if not material_info:
-                    raise ValueError(f"Material {material_name}: not found in inventory")
-
-
-                material_id, name, stock_level, reorder_level, cost_per_unit = material_info #break down tuple
-
-                required_amount = quantity_needed * quantity
-
-                if stock_level < required_amount:
-                    raise ValueError(f"Insufficient {material_name}: need {required_amount}, have {stock_level}")
-
-
-                #deduct from raw_materials
-            for _, row in recipe_df.iterrows(): #iterate through each row of recipe df
-                material_id = row['material_id'] #get id
-                material_name = row['material_name'] #get material name
-                quantity_needed = row['quantity_needed'] # needed amount
-                required_amount = quantity_needed * quantity
-
-                #deduct from raw_materials
-                db.execute(cursor, """
-                UPDATE raw_materials
-                SET stock_level = stock_level - %s
-                WHERE material_id = %s
-                    """,(required_amount, material_id,))
-                
-                if cursor.rowcount == 0:
-                    raise ValueError(
-                    f"Failed to deduct stock for '{material_name}' (id={material_id}). "
-                    "The material may have been deleted or the recipe has a broken reference."
-    )
-
-                #add to batch_materials
-                db.execute(cursor, """
-                INSERT INTO batch_materials (batch_id, material_id, quantity_used)
-                    VALUES (%s, %s, %s)
-                    """, (batch_id, material_id, required_amount))
+            # total needed per material (same material can be in a recipe twice)
+            needs = {}
+            names = {}
+            for material_id, material_name, quantity_needed in recipe_rows:
+                needs[material_id] = needs.get(material_id, 0) + float(quantity_needed) * quantity
+                names[material_id] = material_name
+
+            if db.is_postgres:
+                # lock the rows in material_id order first. the UPDATE below locks rows in
+                # whatever order the planner joins them, so two batches sharing materials could
+                # deadlock - with the same lock order everywhere the second one just waits.
+                # (sqlite only has one writer at a time, nothing to order)
+                db.execute(cursor, f"""
+                    SELECT material_id FROM raw_materials
+                    WHERE material_id IN ({", ".join(["%s"] * len(needs))})
+                    ORDER BY material_id
+                    FOR UPDATE
+                """, tuple(needs))
+
+            # check + deduct every material in one statement: a row only updates if it has
+            # enough stock, RETURNING says which ones did - anything missing is short.
+            # the stock check is part of the UPDATE, so there's no gap where another
+            # batch could use the stock between checking and deducting
+            deducted = _change_stock_levels(db, cursor, needs, sign=-1, only_if_enough=True)
+            short = set(needs) - {row[0] for row in deducted}
+
+            if short:
+                # short rows weren't touched by the update, so their stock is still accurate here.
+                # the except below rolls back the deductions that did happen
+                db.execute(cursor, f"""
+                    SELECT material_id, stock_level FROM raw_materials
+                    WHERE material_id IN ({", ".join(["%s"] * len(short))})
+                """, tuple(short))
+                stock = dict(cursor.fetchall())
+                for material_id, required_amount in needs.items(): # recipe order, first problem wins
+                    if material_id not in short:
+                        continue
+                    material_name = names[material_id]
+                    if material_id not in stock:
+                        raise ValueError(f"Material {material_name}: not found in inventory")
+                    raise ValueError(f"Insufficient {material_name}: need {required_amount}, have {stock[material_id]}")
+
+            #add to batch_materials
+            db.executemany(cursor, """
+            INSERT INTO batch_materials (batch_id, material_id, quantity_used)
+                VALUES (%s, %s, %s)
+                """, [(batch_id, material_id, required_amount) for material_id, required_amount in needs.items()])
 
 
         
         # ALSO IF BATCH TYPE IS MIX, ADD THE MIXED PRODUCT TO RAW_MATERIALS WITH is_housemade = True, SO IT CAN BE USED IN FUTURE BATCHES.if not already in raw_materials,
         # otherwise if its already in raw_materials, just update the stock level by adding the quantity of the batch we just made.
         if batch_type == 'mix': # add to raw_materials.
-            existing_mix = get_raw_material(product_name)
+            db.execute(cursor, """
+                SELECT material_id FROM raw_materials WHERE LOWER(name) = LOWER(%s)
+            """, (product_name,))
+            existing_mix = cursor.fetchone()
             if existing_mix:
                 db.execute(cursor, """
                     UPDATE raw_materials SET stock_level = stock_level + %s
@@ -684,7 +869,7 @@ def add_to_batches(product_name, quantity, notes=None, batch_id=None, deduct_res
 
 
         db.commit()
-        print(f"Added {quantity} units of {product_name} (Batch {batch_id})")
+        logging.info("Added %s units of %s (Batch %s)", quantity, product_name, batch_id)
         return batch_id
 
 
@@ -718,9 +903,10 @@ def get_batches():
     ORDER BY batch_id DESC
     """
 
-    result = pd.read_sql_query(query, db.conn)
-    db.close()
-    return result
+    try:
+        return _read_df(db, query)
+    finally:
+        db.close()
 
 
 def get_batches_shipped():
@@ -734,9 +920,10 @@ def get_batches_shipped():
     ORDER BY date_shipped DESC
     """
 
-    result = pd.read_sql_query(query, db.conn)
-    db.close()
-    return result
+    try:
+        return _read_df(db, query)
+    finally:
+        db.close()
 
 def mark_as_shipped(batch_id):
     """Marks a batch as shipped"""
@@ -752,13 +939,13 @@ def mark_as_shipped(batch_id):
 
 
         if cursor.rowcount == 0: # make sure the batch id exists and was updated
-            print(f"Batch ID {batch_id} not found. No batch marked as shipped.") # if doesnt exist, there was an error marking batch as shipped. 
+            logging.warning("Batch ID %s not found. No batch marked as shipped.", batch_id) # if doesnt exist, there was an error marking batch as shipped. 
             db.rollback()
             return False
 
 
         db.commit()
-        print(f" Marked batch {batch_id} as shipped")
+        logging.info("Marked batch %s as shipped", batch_id)
         return True
 
     except Exception as e:
@@ -773,50 +960,42 @@ def delete_batch(batch_id, materials_to_reallocate=None, reallocate=False):
     Deletes a batch from batches.
     Optionally reallocates raw materials back into inventory.
     materials_to_reallocate: list of dicts with keys 'material_id', 'quantity_used', 'material_name' for each material to reallocate back to inventory. Only used if reallocate is True.
+    if reallocate is True and no list is given, everything the batch used (from batch_materials) goes back.
     """
 
     db = get_db_connection()
     cursor = db.cursor()
 
     try:
-        # Get batch info
-        db.execute(cursor, """
-            SELECT product_name, quantity
-            FROM batches
-            WHERE batch_id = %s
-        """, (batch_id,))
-        row = cursor.fetchone()
+        # no up-front "does the batch exist" SELECT - the DELETE FROM batches below
+        # reports 0 rows if it doesn't, and everything before it gets rolled back
 
-        if not row:
-            logging.info(f"Batch ID {batch_id} not found in batches.")
-            return None
-
-
-
-
-
-        if reallocate and materials_to_reallocate: # if reallocate is True and there are materials to reallocate, add them back to inventory and then delete the batch and its materials. otherwise just delete batch and its materials without adding back to inventory.
-
-            materials_added = []
-            #get batch material info from batch id
-
-
-            for mat in materials_to_reallocate: #for each material to reallocate, add back to stock level
-                material_id = mat['material_id']
-                quantity_used = mat['quantity_used']
-                material_name = mat['material_name']
+        if reallocate: # if reallocate is True, add materials back to inventory and then delete the batch and its materials. otherwise just delete batch and its materials without adding back to inventory.
 
+            returned = {} # material_id -> quantity going back to stock
+            if materials_to_reallocate:
+                # caller picked which materials / how much (web form)
+                for mat in materials_to_reallocate:
+                    material_id = int(mat['material_id'])
+                    returned[material_id] = returned.get(material_id, 0) + mat['quantity_used']
+            else:
+                # no list given (CLI) - everything the batch used goes back
                 db.execute(cursor, """
-                    UPDATE raw_materials
-                    SET stock_level = stock_level + %s
-                    WHERE material_id = %s
-                """, (quantity_used, material_id))
+                    SELECT material_id, SUM(quantity_used)
+                    FROM batch_materials
+                    WHERE batch_id = %s
+                    GROUP BY material_id
+                """, (batch_id,))
+                returned = dict(cursor.fetchall())
 
-                materials_added.append({
-                    "material": material_name,
-                    "quantity_added": quantity_used
-                    })
-            # delete batch materials after adding to list
+            materials_added = []
+            if returned:
+                # add them all back in one UPDATE
+                materials_added = [
+                    {"material": name, "quantity_added": returned[material_id]}
+                    for material_id, name in _change_stock_levels(db, cursor, returned, returning=("material_id", "name"))
+                ]
+            # delete batch materials after adding back
             db.execute(cursor, """
                 DELETE 
                 FROM batch_materials
@@ -830,7 +1009,9 @@ def delete_batch(batch_id, materials_to_reallocate=None, reallocate=False):
             """, (batch_id,))
             #make sure it deleted it
             if cursor.rowcount == 0:
-                raise ValueError(f"batch ID {batch_id} not found — nothing deleted")
+                logging.info(f"Batch ID {batch_id} not found in batches.")
+                db.rollback()
+                return None
             
             db.commit()
             
@@ -851,7 +1032,9 @@ def delete_batch(batch_id, materials_to_reallocate=None, reallocate=False):
             """, (batch_id,))
             #check it deleted
             if cursor.rowcount == 0:
-                raise ValueError(f"batch ID {batch_id} not found — nothing deleted")
+                logging.info(f"Batch ID {batch_id} not found in batches.")
+                db.rollback()
+                return None
             db.commit()
             logging.info(f"Successfully deleted batch {batch_id}.")
             return True
@@ -884,7 +1067,7 @@ def get_all_batches_with_id():
         ORDER BY date_completed DESC
         """
 
-        result = pd.read_sql_query(query, db.conn)
+        result = _read_df(db, query)
         
         return result
 
@@ -952,6 +1135,7 @@ def update_batch(batch_id, product_name=None, quantity=None, date_completed=None
 
     if not field: #empty dictionary, no fields to update
         logging.info("No fields to update")
+        db.close()
         return
 
     try:
@@ -1078,8 +1262,24 @@ def promote_planned_batches():
             #now for "finished batches, deduction happens here, must do a stock check though."
 
             elif batch_type == 'finished':
-                recipe_df = get_recipe(product_name)
-                if recipe_df is None or recipe_df.empty:
+                # recipe + current stock in one query, on this connection so it sees
+                # stock already deducted by earlier batches in this same promotion run.
+                # on postgres the material rows are locked (in material_id order, same as
+                # add_to_batches) so stock can't be used by someone else between this check
+                # and the deduction below
+                lock_sql = "FOR UPDATE OF raw" if db.is_postgres else ""
+                db.execute(cursor, f"""
+                    SELECT rm.material_id, raw.name, rm.quantity_needed, raw.stock_level, raw.unit
+                    FROM recipe_materials rm
+                    JOIN raw_materials raw ON rm.material_id = raw.material_id
+                    WHERE rm.recipe_id = (
+                        SELECT MIN(recipe_id) FROM recipes WHERE LOWER(product_name) = LOWER(%s)
+                    )
+                    ORDER BY raw.material_id ASC
+                    {lock_sql}
+                """, (product_name,))
+                recipe_rows = cursor.fetchall()
+                if not recipe_rows:
                     db.execute(cursor,"""
                         UPDATE batches
                         SET promotion_failure_reason = %s
@@ -1089,22 +1289,10 @@ def promote_planned_batches():
                     continue
 
                 failure_reason = None #initialize failure reason
-                #if recipe_df not none/empty:
-                for _, row in recipe_df.iterrows(): # get each mat in recipe
-                    material_name = row['material_name']
-                    required = row['quantity_needed'] * quantity
-
-
-                    db.execute(cursor, """
-                        SELECT stock_level, unit FROM raw_materials
-                        WHERE LOWER(name) = LOWER(%s)
-                    """, (material_name,))
-                    mat = cursor.fetchone()
-                    if not mat:
-                        failure_reason = f"Material not found: {material_name}"
-                        break
+                #if recipe not empty:
+                for material_id, material_name, quantity_needed, stock, unit in recipe_rows: # get each mat in recipe
+                    required = quantity_needed * quantity
 
-                    stock, unit = mat
                     if stock < required: #if not enough
                         failure_reason = (
                             f"Insufficient stock: {material_name} "
@@ -1125,19 +1313,17 @@ def promote_planned_batches():
                 else: #if there was valid stock levels, deduct and promote:
 
                      
-                    for _, row in recipe_df.iterrows():
-                        material_name = row['material_name']
-                        material_id = row['material_id']
-                        required = row['quantity_needed'] * quantity
-                        db.execute(cursor, """
-                            UPDATE raw_materials
-                            SET stock_level = stock_level - %s
-                            WHERE material_id = %s
-                        """, (required, material_id))
-                        db.execute(cursor, """
-                            INSERT INTO batch_materials (batch_id, material_id, quantity_used)
-                            VALUES (%s, %s, %s)
-                        """, (batch_id, material_id, required))
+                    used = [(material_id, quantity_needed * quantity)
+                            for material_id, material_name, quantity_needed, stock, unit in recipe_rows]
+                    db.executemany(cursor, """
+                        UPDATE raw_materials
+                        SET stock_level = stock_level - %s
+                        WHERE material_id = %s
+                    """, [(required, material_id) for material_id, required in used])
+                    db.executemany(cursor, """
+                        INSERT INTO batch_materials (batch_id, material_id, quantity_used)
+                        VALUES (%s, %s, %s)
+                    """, [(batch_id, material_id, required) for material_id, required in used])
 
                     db.execute(cursor, """
                         UPDATE batches
@@ -1175,9 +1361,39 @@ def get_batches_planned():
     WHERE status = 'Planned'
     ORDER BY batch_id DESC
     """
-    result = pd.read_sql_query(query, db.conn)
-    db.close()
-    return result
+    try:
+        return _read_df(db, query)
+    finally:
+        db.close()
+
+
+def get_ready_and_planned_batches():
+    """
+    Gets Ready and Planned batches with one query instead of get_batches() + get_batches_planned()
+    (one round trip to the database instead of two, for the batches page which shows both)
+
+    returns (ready_df, planned_df) with the same columns / order as those two functions
+    """
+    promote_planned_batches() # promote first, same as get_batches(), so nothing shows up in both
+    db = get_db_connection()
+    query = """
+    SELECT batch_id, product_name, batch_type, quantity, date_completed, planned_completion_date,
+           notes, expiration_date, promotion_failure_reason, status
+    FROM batches
+    WHERE status IN ('Ready', 'Planned')
+    ORDER BY batch_id DESC
+    """
+    try:
+        df = _read_df(db, query)
+    finally:
+        db.close()
+
+    ready = df.loc[df['status'] == 'Ready',
+                   ['batch_id', 'product_name', 'batch_type', 'quantity', 'date_completed', 'notes', 'expiration_date']]
+    planned = df.loc[df['status'] == 'Planned',
+                     ['batch_id', 'product_name', 'batch_type', 'quantity', 'planned_completion_date', 'notes',
+                      'expiration_date', 'promotion_failure_reason']]
+    return ready.reset_index(drop=True), planned.reset_index(drop=True)
 
 
 def get_batch_materials(batch_id):
@@ -1283,14 +1499,13 @@ def adjust_batch_material(batch_id, new_quantities: dict):
 def check_batch_materials_stock(batch_id, new_quantities: dict):
     """
     Used to check if new qantites for batch materials availible in stock before adjusting. 
-    
+    returns True if every increase is covered by current stock, otherwise False.
     """
     db = get_db_connection()
     cursor = db.cursor()
 
-    for material_id, new_qty in new_quantities.items():
-        
-        try:
+    try:
+        for material_id, new_qty in new_quantities.items():
             db.execute(cursor, """
                 SELECT quantity_used FROM batch_materials 
                 WHERE batch_id = %s AND material_id = %s
@@ -1319,63 +1534,87 @@ def check_batch_materials_stock(batch_id, new_quantities: dict):
                     logging.warning(f"Insufficient stock to increase material {material_id} for batch {batch_id} during stock check: need additional {delta}, have {stock_level}")
                     return False
 
-        except Exception as e:
-            logging.error(f"Error checking batch materials stock: {e}")
-            return False
+        return True
+
+    except Exception as e:
+        logging.error(f"Error checking batch materials stock: {e}")
+        return False
 
-        finally:
-            db.close()
+    finally:
+        db.close()
 # ========================
 # RECIPE FUNCTIONS
 # ========================
 
 
-def get_recipe(product_name):
+def _material_ids_by_name(db, cursor, names):
     """
-    Gets recipe from recipes, which refrences recipe materials
+    looks up material_ids for a list of material names in one query (instead of a
+    get_raw_material() call per name), on the caller's connection
 
+    returns dict of name (exactly as passed in) -> material_id, names not in raw_materials are left out
     """
+    names = list(dict.fromkeys(names)) # drop repeats, keep order
+    if not names:
+        return {}
+
+    # case folding is left to the database (LOWER on both sides, same as get_raw_material).
+    # python's .lower() also folds non-ascii letters (É -> é) and sqlite's LOWER doesn't,
+    # so lowering here would miss names like "Évian Water".
+    # (VALUES ...) column is column1 on both databases
+    placeholders = ", ".join(["(%s)"] * len(names))
+    db.execute(cursor, f"""
+        SELECT wanted.column1, raw.material_id
+        FROM (VALUES {placeholders}) AS wanted
+        JOIN raw_materials raw ON LOWER(raw.name) = LOWER(wanted.column1)
+    """, tuple(names))
+    return dict(cursor.fetchall())
+
+
+def _recipe_rows(db, cursor, product_name):
+    """
+    runs the recipe query on the caller's connection, returns (columns, rows).
+    rows is empty if the recipe doesn't exist (or has no materials left).
+    add_to_batches calls it inside its own transaction, so the amounts it deducts are
+    the recipe as it is right now, not a copy from earlier
+    """
+    # one query: the recipe_id lookup is a subquery instead of its own round trip.
+    # MIN() picks the same recipe every time if a name was ever saved twice
+    query = ("""
+    SELECT r.product_name,
+    r.notes,
+    rm.material_id,
+    raw.name AS material_name,
+    rm.quantity_needed
+    FROM recipes r
+    JOIN recipe_materials rm ON r.recipe_id = rm.recipe_id
+    JOIN raw_materials raw ON rm.material_id = raw.material_id
+    WHERE r.recipe_id = (SELECT MIN(recipe_id) FROM recipes WHERE LOWER(product_name) = LOWER(%s))
+    ORDER BY rm.material_name ASC
+    """)
 
+    db.execute(cursor, query, (product_name,))
+    rows = cursor.fetchall()
+    columns = [desc[0] for desc in cursor.description]
+    return columns, rows
+
+
+def get_recipe(product_name):
+    """
+    Gets recipe from recipes, which refrences recipe materials
+    None if there's no recipe (or it has no materials left)
+    """
     db = get_db_connection()
     cursor = db.cursor()
 
     try:
-        
-        db.execute(cursor,"""
-        SELECT recipe_id
-        FROM recipes
-        WHERE LOWER(product_name) = LOWER(%s)   
-                       """,(product_name,))
-        row = cursor.fetchone() # get recipe_id from product name
+        columns, rows = _recipe_rows(db, cursor, product_name)
 
-        if not row:
-            print(f"{product_name} not found in recipes")
+        if not rows: # callers treat no recipe / no materials the same
+            logging.info("%s not found in recipes", product_name)
             return None
-        recipe_id = row[0]
-        
-        query = ("""
-        SELECT r.product_name,
-        r.notes,
-        rm.material_id,
-        raw.name AS material_name,
-        rm.quantity_needed
-        FROM recipes r
-        JOIN recipe_materials rm ON r.recipe_id = rm.recipe_id
-        JOIN raw_materials raw ON rm.material_id = raw.material_id
-        WHERE r.recipe_id = %s
-        ORDER BY rm.material_name ASC
-        """)
-
-        db.execute(cursor, query, (recipe_id,))
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        df = pd.DataFrame(rows, columns=columns)
-
-        return df
-        
-
-
 
+        return pd.DataFrame(rows, columns=columns)
 
     except Exception as e:
         logging.error(f"Error: {e} \ngetting recipe:{product_name}.")
@@ -1413,9 +1652,10 @@ def get_all_recipes():
     """
     # Note: unit comes from raw_materials (raw.unit), NOT recipe_materials
 
-    result = pd.read_sql_query(query, db.conn)
-    db.close()
-    return result
+    try:
+        return _read_df(db, query)
+    finally:
+        db.close()
 
     
         
@@ -1449,40 +1689,40 @@ def add_recipe(product_name, materials, notes=None):
         db.execute(cursor,"""
         INSERT INTO recipes (product_name, notes)
         VALUES (%s, %s)
+        RETURNING recipe_id
          """,(product_name, notes))
-        recipe_id = db.get_last_insert_id(cursor) # get recipe_id, able to add to recipe_materials
+        recipe_id = cursor.fetchone()[0] # get recipe_id, able to add to recipe_materials
 
 
 
+        #check materials are in database, all in one lookup
+        material_ids = _material_ids_by_name(db, cursor, [m["material_name"] for m in materials])
+
+        rows = []
         for material in materials:
             material_name = material["material_name"]
             quantity_needed = material['quantity_needed']
 
-            #check material is in database
-
-            material_info = get_raw_material(material_name)
+            material_id = material_ids.get(material_name)
 
-            if not material_info:
+            if material_id is None:
                 logging.error(f"Material '{material_name}' not found in raw_materials while adding recipe '{product_name}'.")
                 raise ValueError(f"Material '{material_name}' not found in raw_materials. Please add it to inventory before creating the recipe.")
-                
-
-            else:
-                material_id = material_info[0]#get material_id, first value from get_raw_material result
 
+            rows.append((recipe_id, material_name, material_id, quantity_needed))
 
-            db.execute(cursor,"""
-            INSERT INTO recipe_materials (
-                   recipe_id,
-                   material_name,
-                   material_id,
-                   quantity_needed)
-            VALUES (%s,%s,%s,%s)                              
-              """,(recipe_id, material_name, material_id, quantity_needed))
+        db.executemany(cursor,"""
+        INSERT INTO recipe_materials (
+               recipe_id,
+               material_name,
+               material_id,
+               quantity_needed)
+        VALUES (%s,%s,%s,%s)                              
+          """, rows)
             
 
         db.commit()
-        print(f"Recipe '{product_name}' added successfully with {len(materials)} materials.")
+        logging.info("Recipe '%s' added successfully with %s materials.", product_name, len(materials))
         return recipe_id
 
 
@@ -1521,64 +1761,56 @@ def change_recipe(product_name, materials, notes= None):
     
     try:
 
+        # update notes and get the recipe_id back in one go (no separate SELECT first).
+        # MIN() = the same recipe get_recipe / delete_recipe pick if a name was ever saved twice
         db.execute(cursor,"""
-        SELECT recipe_id
-        FROM recipes
-        WHERE LOWER(product_name) = LOWER(%s)
-
-                       """,(product_name,))
+        UPDATE recipes
+        SET notes = %s
+        WHERE recipe_id = (SELECT MIN(recipe_id) FROM recipes WHERE LOWER(product_name) = LOWER(%s))
+        RETURNING recipe_id
+                       """,(notes, product_name,))
         recipe_id = cursor.fetchone()
 
         if not recipe_id:
-            print(f"No recipe found for {product_name}")
+            logging.warning("No recipe found for %s", product_name)
             return None
         recipe_id = recipe_id[0]
 
 
-
-        db.execute(cursor,"""
-        UPDATE recipes
-        SET notes = %s
-        WHERE LOWER(product_name) = LOWER(%s)               
-                       
-                       """,(notes, product_name,))
-        
-
         db.execute(cursor,"""
         DELETE FROM recipe_materials
         WHERE recipe_id = %s               
                        """,(recipe_id,))
         
 
+        material_ids = _material_ids_by_name(db, cursor, [m["material_name"] for m in materials])
+
+        rows = []
         for material in materials:
             material_name = material["material_name"]
             quantity_needed = material['quantity_needed']
 
+            material_id = material_ids.get(material_name)
 
-            material_info = get_raw_material(material_name)
-
-            if not material_info:
+            if material_id is None:
                 logging.error(f"Material '{material_name}' not found in raw _materials while updating recipe '{product_name}'.") 
                 raise ValueError(f"Material '{material_name}' not found in raw_materials. Please add it to inventory before updating the recipe.")
-                    
-
-            else:
-                material_id = material_info[0]#get material_id, first value from get_raw_material result
 
+            rows.append((recipe_id, material_name, material_id, quantity_needed))
 
-            db.execute(cursor,"""
-            INSERT INTO recipe_materials (
-            
-            recipe_id,
-            material_name,
-            material_id,
-            quantity_needed)
-            VALUES (%s,%s,%s,%s)                             
-                """, (recipe_id, material_name, material_id, quantity_needed))
+        db.executemany(cursor,"""
+        INSERT INTO recipe_materials (
+        
+        recipe_id,
+        material_name,
+        material_id,
+        quantity_needed)
+        VALUES (%s,%s,%s,%s)                             
+            """, rows)
         
 
         db.commit()
-        print(f"Recipe '{product_name}' changed successfully with {len(materials)} materials.")
+        logging.info("Recipe '%s' changed successfully with %s materials.", product_name, len(materials))
         return recipe_id
         
 
@@ -1591,71 +1823,51 @@ def change_recipe(product_name, materials, notes= None):
         db.close()
     
 
-def delete_recipe(product_name):
+def delete_recipe(product_name, verbose=False):
     
 
 
-    "deletes recipe"
+    """deletes recipe. verbose=True also logs the materials that were in it"""
 
     db = get_db_connection()
     cursor = db.cursor()
 
     try:
 
-        #get id
-        db.execute(cursor,"""
-        SELECT recipe_id
-        FROM recipes
-        WHERE LOWER(product_name) = LOWER(%s)
+        # two statements, no separate id lookup: the recipe is found by a subquery in each
+        # DELETE (MIN() = the same recipe get_recipe shows, if a name was ever saved twice).
+        # materials first, then the recipe - same transaction, one commit, so a crash can't
+        # leave one without the other. children first so the foreign key is never pointing
+        # at a deleted recipe (older databases don't have ON DELETE CASCADE).
+        # RETURNING hands back the deleted materials for the log, no SELECT needed
+        db.execute(cursor, """
+        DELETE FROM recipe_materials
+        WHERE recipe_id = (SELECT MIN(recipe_id) FROM recipes WHERE LOWER(product_name) = LOWER(%s))
+        RETURNING material_name, quantity_needed
                        """,(product_name,))
-        row = cursor.fetchone()
-
-        if not row:
-            print(f"Recipe for {product_name} not found.")
-            return None
-        recipe_id = row[0]
+        deleted_materials = cursor.fetchall()
 
-        
-        
-        #get materials that will be deleted 
-        query = ("""
-        SELECT material_name, quantity_needed               
-        FROM recipe_materials
-        WHERE recipe_id = %s                             
-                       """)
-        df = pd.read_sql_query(query, db.conn, params=(recipe_id,) )
-
-        #clean query for presentation
-
-        df = df.rename(columns={
-            'material_name': 'Material',
-        'quantity_needed': 'Quantity Needed'
-            })
-        
-        
         #delete recipe from recipes
         db.execute(cursor,"""
         DELETE FROM recipes
-        WHERE LOWER(product_name) = LOWER(%s)               
+        WHERE recipe_id = (SELECT MIN(recipe_id) FROM recipes WHERE LOWER(product_name) = LOWER(%s))
+        RETURNING recipe_id
                        """,(product_name,))
         
-        if cursor.rowcount == 0:
-            print(f"Recipe '{product_name}' not found.")
-            db.close()
+        if cursor.fetchone() is None:
+            logging.warning("Recipe '%s' not found.", product_name)
+            db.rollback()
             return None
-
-
-        db.execute(cursor, """
-        DELETE FROM recipe_materials
-        WHERE recipe_id = %s
-                       """,(recipe_id,))
-
-
-        
         
         db.commit()
 
-        print(f"Deleted {product_name} from recipe log, {product_name}'s recipe:\n{df}")
+        if verbose:
+            # plain text from the tuples, no DataFrame just to print it
+            recipe_text = "\n".join(f"{material}\t{quantity}" for material, quantity in deleted_materials)
+            logging.info("Deleted %s from recipe log, %s's recipe:\n%s", product_name, product_name, recipe_text)
+        else:
+            logging.info("Deleted %s from recipe log", product_name)
+        return True
     
     except Exception as e:
         logging.error(f"Error: {e}")
@@ -1675,7 +1887,6 @@ def get_all_recipes_with_id():
 
 
     db = get_db_connection()
-    cursor = db.cursor()
 
     try:
         query = """
@@ -1688,7 +1899,7 @@ def get_all_recipes_with_id():
 # uses joins to get recipe_id, product name, and notes for all recipes, then uses DISTINCT to only get one row per recipe 
 # (since there are multiple rows per recipe in recipe_materials), orders by product name.
 # this is done because view_recipes() uses joins aswell, so they both show same list of recipes. 
-        result = pd.read_sql_query(query, db.conn)
+        result = _read_df(db, query)
         return result
 
     except Exception as e:
@@ -1790,34 +2001,30 @@ def update_recipe(recipe_id, product_name=None, materials=None, notes=None):
                        """,(recipe_id,)) # delete old materials
         
 
+        material_ids = _material_ids_by_name(db, cursor, [m["material_name"] for m in materials])
+
+        rows = []
         for material in materials: 
             material_name = material["material_name"]
             quantity_needed = material['quantity_needed']
 
+            material_id = material_ids.get(material_name)
 
-            material_info = get_raw_material(material_name)
-
-            if not material_info:
-                print(f"Warning: Material '{material_name}' not found in raw_materials.")
-                material_id = None
-
-            else:
-                material_id = material_info[0]#get material_id, first value from get_raw_material result
+            if material_id is None:
+                logging.warning("Material '%s' not found in raw_materials.", material_name)
 
+            rows.append((recipe_id, material_name, material_id, quantity_needed))
 
-            db.execute(cursor,"""
-            INSERT INTO recipe_materials (
-            
-            recipe_id,
-            material_name,
-            material_id,
-            quantity_needed)
-            VALUES (%s,%s,%s,%s)                             
-                """, (recipe_id, material_name, material_id, quantity_needed))
+        db.executemany(cursor,"""
+        INSERT INTO recipe_materials (
+        
+        recipe_id,
+        material_name,
+        material_id,
+        quantity_needed)
+        VALUES (%s,%s,%s,%s)                             
+            """, rows)
         
-
-            if cursor.rowcount == 0:
-                    raise ValueError(f"recipe ID {recipe_id} not found — nothing inserted")
         db.commit()
         logging.info(f"Recipe with recipe_id:{recipe_id} changed successfully with {len(materials)} materials.")
         return recipe_id
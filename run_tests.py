@@ -5,9 +5,15 @@ No Flask server needed.
 
 import sys
 import os
+import json
+import shutil
 import sqlite3
+import subprocess
+import tempfile
 from datetime import datetime, timedelta
 
+import pandas as pd
+
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from inventory_app import (
@@ -16,8 +22,12 @@ from inventory_app import (
     add_recipe,
     promote_planned_batches,
     get_raw_material,
+    get_recipe,
+    change_recipe,
+    delete_batch,
 )
 from database import get_db_connection
+import helper_functions
 
 # ── helpers ────────────────────────────────────────────────────────────────
 
@@ -393,6 +403,218 @@ result("3.3 no orphaned batch_materials rows",
        f"found {len(orphans)} orphaned rows: {orphans}")
 
 
+# ── BLOCK 4 ────────────────────────────────────────────────────────────────
+
+print("\n" + "="*60)
+print("BLOCK 4 — Stock refunds, freshness, backups")
+print("="*60)
+
+# Test 4.1
+print("\n--- Test 4.1 — Short stock names the material, nothing deducted ---")
+set_stock("Test Ingredient A", 1000)
+set_stock("Test Ingredient B", 10)
+try:
+    add_to_batches("Test Mix", 1)
+    result("4.1a ValueError raised", False, "no exception raised")
+except ValueError as e:
+    result("4.1a message names the short material and amounts",
+           "Insufficient Test Ingredient B" in str(e) and "need 30" in str(e),
+           str(e))
+except Exception as e:
+    result("4.1a ValueError raised", False, f"got {type(e).__name__}: {e}")
+
+stock_a = get_stock("Test Ingredient A")
+result("4.1b Ingredient A (had enough) still = 1000 (rollback)",
+       stock_a == 1000,
+       f"got {stock_a}")
+
+
+# Test 4.2
+print("\n--- Test 4.2 — delete_batch(reallocate=True) with no list refunds batch_materials ---")
+set_stock("Test Ingredient A", 500)
+set_stock("Test Ingredient B", 300)
+try:
+    b42_id = add_to_batches("Test Mix", 2)
+    used_a = get_stock("Test Ingredient A")
+    deleted = delete_batch(b42_id, reallocate=True)
+    stock_a = get_stock("Test Ingredient A")
+    stock_b = get_stock("Test Ingredient B")
+    result("4.2a batch deducted before delete (A = 400)",
+           used_a == 400,
+           f"got {used_a}")
+    result("4.2b A and B back to 500 / 300",
+           deleted is True and stock_a == 500 and stock_b == 300,
+           f"deleted={deleted}, A={stock_a}, B={stock_b}")
+    result("4.2c batch and batch_materials rows gone",
+           get_batch_row(b42_id) is None and not get_batch_materials_rows(b42_id),
+           f"batch={get_batch_row(b42_id)}")
+except Exception as e:
+    result("4.2 — unexpected exception", False, str(e))
+
+
+# Test 4.3
+print("\n--- Test 4.3 — Recipe changed by another connection is used straight away ---")
+try:
+    get_recipe("Test Mix") # read it once first, like a page view would
+    # another process (CLI / other web worker) changes the recipe
+    conn = sqlite3.connect('data/inventory.db')
+    conn.execute("""
+        UPDATE recipe_materials SET quantity_needed = 20
+        WHERE material_id = ? AND recipe_id IN (SELECT recipe_id FROM recipes WHERE product_name = 'Test Mix')
+    """, (mat_a_id,))
+    conn.commit()
+    conn.close()
+
+    recipe_df = get_recipe("Test Mix")
+    qty_a = recipe_df.loc[recipe_df['material_name'] == "Test Ingredient A", 'quantity_needed'].iloc[0]
+    result("4.3a get_recipe shows the new amount (20)",
+           float(qty_a) == 20,
+           f"got {qty_a}")
+
+    b43_id = add_to_batches("Test Mix", 1)
+    stock_a = get_stock("Test Ingredient A")
+    result("4.3b add_to_batches deducts the new amount (A = 480)",
+           stock_a == 480,
+           f"got {stock_a}")
+    delete_batch(b43_id, reallocate=True)
+except Exception as e:
+    result("4.3 — unexpected exception", False, str(e))
+
+
+# Test 4.4
+print("\n--- Test 4.4 — Backup rotation and restore ---")
+backup_tmp = tempfile.mkdtemp()
+saved_dir, saved_manifest = helper_functions.BACKUP_DIR, helper_functions.BACKUP_MANIFEST
+helper_functions.BACKUP_DIR = backup_tmp
+helper_functions.BACKUP_MANIFEST = os.path.join(backup_tmp, 'manifest.json')
+try:
+    # one fake backup a day for the last 120 days, plus two from the last few hours
+    now = datetime.now().timestamp()
+    ages = [h * 3600 for h in (1, 3)] + [d * 24 * 3600 for d in range(1, 121)]
+    for i, age in enumerate(ages):
+        path = os.path.join(backup_tmp, f"inventory_backup_test_{i:03d}.db")
+        open(path, 'w').close()
+        os.utime(path, (now - age, now - age))
+
+    deleted = helper_functions._prune_backups()
+    remaining = sorted(name for name in os.listdir(backup_tmp) if name.endswith('.db'))
+    keep_max = 2 + helper_functions.KEEP_DAILY + helper_functions.KEEP_WEEKLY + helper_functions.KEEP_MONTHLY
+    result("4.4a backups from the last 24 hours kept",
+           "inventory_backup_test_000.db" in remaining and "inventory_backup_test_001.db" in remaining,
+           f"remaining={remaining}")
+    result("4.4b old backups rotated out",
+           "inventory_backup_test_121.db" in deleted and len(remaining) <= keep_max,
+           f"{len(remaining)} kept, max {keep_max}")
+    with open(helper_functions.BACKUP_MANIFEST) as f:
+        manifest_files = sorted(b['file'] for b in json.load(f)['backups'])
+    result("4.4c manifest lists exactly the kept backups",
+           manifest_files == remaining,
+           f"manifest={manifest_files}")
+
+    backup_path = helper_functions.backup_database(reason="test")
+    restored_path = os.path.join(backup_tmp, 'restored.db')
+    restored = helper_functions.restore_backup(backup_path, destination=restored_path) if backup_path else None
+    restored_row = None
+    if restored:
+        conn = sqlite3.connect(restored_path)
+        restored_row = conn.execute(
+            "SELECT stock_level FROM raw_materials WHERE name = 'Test Ingredient A'").fetchone()
+        conn.close()
+    result("4.4d restore_backup gives back the database as it was backed up",
+           restored_row is not None and float(restored_row[0]) == get_stock("Test Ingredient A"),
+           f"backup={backup_path}, restored row={restored_row}")
+
+    # a process that died mid-session leaves a -wal file next to the database -
+    # restoring over it must not bring the old rows back
+    stale_path = os.path.join(backup_tmp, 'stale.db')
+    subprocess.run([sys.executable, "-c",
+        "import os, sqlite3\n"
+        f"conn = sqlite3.connect({stale_path!r})\n"
+        "conn.execute('PRAGMA journal_mode=WAL')\n"
+        "conn.execute('PRAGMA wal_autocheckpoint=0')\n"
+        "conn.execute('CREATE TABLE raw_materials (name TEXT, stock_level REAL)')\n"
+        "conn.execute(\"INSERT INTO raw_materials VALUES ('Test Ingredient A', -1)\")\n"
+        "conn.commit()\n"
+        "os._exit(0)\n"], check=True)
+    stale_wal_left = os.path.exists(stale_path + '-wal')
+    restored = helper_functions.restore_backup(backup_path, destination=stale_path) if backup_path else None
+    stale_row = None
+    if restored:
+        conn = sqlite3.connect(stale_path)
+        stale_row = conn.execute(
+            "SELECT stock_level FROM raw_materials WHERE name = 'Test Ingredient A'").fetchone()
+        conn.close()
+    result("4.4e restore over a leftover -wal file gives the backup, not the old rows",
+           stale_wal_left and stale_row is not None and float(stale_row[0]) == get_stock("Test Ingredient A"),
+           f"wal left behind={stale_wal_left}, restored row={stale_row}")
+except Exception as e:
+    result("4.4 — unexpected exception", False, str(e))
+finally:
+    helper_functions.BACKUP_DIR, helper_functions.BACKUP_MANIFEST = saved_dir, saved_manifest
+    shutil.rmtree(backup_tmp, ignore_errors=True)
+
+
+# Test 4.5
+print("\n--- Test 4.5 — Recipe with a non-ASCII material name ---")
+try:
+    evian_id = add_raw_material("Test Évian Water", "Test", 100, "ml", 0)
+    recipe_evian_id = add_recipe("Test Évian Tonic", [
+        {"material_name": "Test Évian Water", "quantity_needed": 10},
+    ])
+    result("4.5a add_recipe finds 'Test Évian Water'",
+           recipe_evian_id is not None,
+           f"add_recipe returned {recipe_evian_id} (material id={evian_id})")
+
+    changed_id = change_recipe("Test Évian Tonic", [
+        {"material_name": "Test Évian Water", "quantity_needed": 15},
+    ])
+    recipe_df = get_recipe("Test Évian Tonic")
+    result("4.5b change_recipe saves the new amount (15)",
+           changed_id == recipe_evian_id and recipe_df is not None
+           and float(recipe_df['quantity_needed'].iloc[0]) == 15,
+           f"change_recipe returned {changed_id}, recipe={recipe_df}")
+except Exception as e:
+    result("4.5 — unexpected exception", False, str(e))
+
+
+# Test 4.6
+print("\n--- Test 4.6 — Excel export keeps dates readable ---")
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+if openpyxl is None:
+    result("4.6 Excel date formats", True, "openpyxl not installed, can't read the file back", warn=True)
+else:
+    xlsx_path = None
+    try:
+        export_df = pd.DataFrame({
+            "created": [datetime(2026, 1, 2, 3, 4, 5)],
+            "planned": [datetime(2026, 1, 3).date()],
+            "quantity": [4],
+        })
+        xlsx_path = helper_functions.export_to_excel(export_df, "test_dates")
+        sheet = openpyxl.load_workbook(xlsx_path).active
+        created_cell, planned_cell, qty_cell = sheet[2][0], sheet[2][1], sheet[2][2]
+        result("4.6a datetime cell has a date format (not a serial number)",
+               created_cell.value == datetime(2026, 1, 2, 3, 4, 5)
+               and created_cell.number_format == "yyyy-mm-dd hh:mm:ss",
+               f"value={created_cell.value!r}, format={created_cell.number_format}")
+        result("4.6b date cell has a date-only format",
+               planned_cell.value == datetime(2026, 1, 3)
+               and planned_cell.number_format == "yyyy-mm-dd",
+               f"value={planned_cell.value!r}, format={planned_cell.number_format}")
+        result("4.6c numbers unchanged",
+               qty_cell.value == 4,
+               f"value={qty_cell.value!r}")
+    except Exception as e:
+        result("4.6 — unexpected exception", False, str(e))
+    finally:
+        if xlsx_path and os.path.exists(xlsx_path):
+            os.remove(xlsx_path)
+
+
 # ── CLEANUP ────────────────────────────────────────────────────────────────
 
 print("\n" + "="*60)